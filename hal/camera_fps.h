@@ -0,0 +1,52 @@
+/**
+ * Camera FPS Measurement Window
+ *
+ * Shared FPS accounting for the camera HALs. Each HAL feeds the window
+ * one timestamp per captured frame; the clock source is the caller's,
+ * so the test stub can drive it from a synthetic clock.
+ */
+
+#ifndef APIS_HAL_CAMERA_FPS_H
+#define APIS_HAL_CAMERA_FPS_H
+
+#include <stdint.h>
+
+#define CAMERA_FPS_SAMPLE_INTERVAL_MS 1000
+
+typedef struct {
+    uint64_t start_ms;       // Start of the current window
+    uint32_t frame_count;    // Frames counted in the current window
+    float current_fps;       // Rate measured over the last closed window
+} camera_fps_t;
+
+/**
+ * Start a fresh measurement window.
+ *
+ * @param fps Window state
+ * @param now_ms Current time in milliseconds
+ */
+static inline void camera_fps_reset(camera_fps_t *fps, uint64_t now_ms) {
+    fps->start_ms = now_ms;
+    fps->frame_count = 0;
+    fps->current_fps = 0.0f;
+}
+
+/**
+ * Count one captured frame and close the window once it spans
+ * CAMERA_FPS_SAMPLE_INTERVAL_MS.
+ *
+ * @param fps Window state
+ * @param now_ms Capture time of the frame in milliseconds
+ */
+static inline void camera_fps_frame(camera_fps_t *fps, uint64_t now_ms) {
+    fps->frame_count++;
+
+    uint64_t elapsed = now_ms - fps->start_ms;
+    if (elapsed >= CAMERA_FPS_SAMPLE_INTERVAL_MS) {
+        fps->current_fps = (float)fps->frame_count * 1000.0f / (float)elapsed;
+        fps->frame_count = 0;
+        fps->start_ms = now_ms;
+    }
+}
+
+#endif // APIS_HAL_CAMERA_FPS_H
@@ -11,6 +11,7 @@
 #ifdef ESP_PLATFORM
 
 #include "camera.h"
+#include "camera_fps.h"
 #include "log.h"
 #include "psram_alloc.h"
 #include "qr_scanner.h"
@@ -87,8 +88,6 @@
 #define CAM_PIN_PCLK    13
 #endif
 
-#define FPS_SAMPLE_INTERVAL_MS 1000
-
 // Internal state
 static bool g_is_initialized = false;
 static bool g_is_open = false;
@@ -96,9 +95,7 @@ static uint32_t g_sequence = 0;
 static uint32_t g_frames_captured = 0;
 static uint32_t g_frames_dropped = 0;
 static int64_t g_start_time_us = 0;
-static int64_t g_fps_start_time_us = 0;
-static uint32_t g_fps_frame_count = 0;
-static float g_current_fps = 0.0f;
+static camera_fps_t g_fps;
 static bool g_logged_first_fb_wait = false;
 static bool g_logged_first_fb_captured = false;
 static bool g_logged_first_frame_ready = false;
@@ -304,21 +301,31 @@ static UINT jpeg_output_func(JDEC *decoder, void *bitmap, JRECT *rect) {
     uint16_t rect_width = (uint16_t)(rect->right - rect->left + 1U);
     uint16_t rect_height = (uint16_t)(rect->bottom - rect->top + 1U);
 
+    // Clip the MCU block against the frame once per row so the inner loop
+    // is a plain RGB->BGR swizzle the compiler can keep in registers.
+    uint16_t visible_width = rect_width;
+    if (rect->left >= frame->width) {
+        return 1;
+    }
+    if ((uint32_t)rect->left + rect_width > frame->width) {
+        visible_width = (uint16_t)(frame->width - rect->left);
+    }
+
     for (uint16_t y = 0; y < rect_height; y++) {
-        for (uint16_t x = 0; x < rect_width; x++) {
-            uint16_t dst_x = (uint16_t)rect->left + x;
-            uint16_t dst_y = (uint16_t)rect->top + y;
-            size_t src_offset = ((size_t)y * rect_width + x) * 3U;
-            size_t dst_offset = ((size_t)dst_y * frame->width + dst_x) * FRAME_CHANNELS;
-
-            if (dst_x >= frame->width || dst_y >= frame->height ||
-                (dst_offset + 2U) >= FRAME_SIZE) {
-                continue;
-            }
+        uint16_t dst_y = (uint16_t)rect->top + y;
+        size_t dst_offset = ((size_t)dst_y * frame->width + rect->left) * FRAME_CHANNELS;
 
-            frame->data[dst_offset + 0] = src[src_offset + 2];  // B
-            frame->data[dst_offset + 1] = src[src_offset + 1];  // G
-            frame->data[dst_offset + 2] = src[src_offset + 0];  // R
+        if (dst_y >= frame->height ||
+            dst_offset + (size_t)visible_width * FRAME_CHANNELS > FRAME_SIZE) {
+            break;
+        }
+
+        const uint8_t *s = src + (size_t)y * rect_width * 3U;
+        uint8_t *d = frame->data + dst_offset;
+        for (uint16_t x = 0; x < visible_width; x++, s += 3, d += FRAME_CHANNELS) {
+            d[0] = s[2];  // B
+            d[1] = s[1];  // G
+            d[2] = s[0];  // R
         }
     }
 
@@ -495,9 +502,7 @@ camera_status_t camera_open(void) {
     g_frames_captured = 0;
     g_frames_dropped = 0;
     g_start_time_us = esp_timer_get_time();
-    g_fps_start_time_us = g_start_time_us;
-    g_fps_frame_count = 0;
-    g_current_fps = 0.0f;
+    camera_fps_reset(&g_fps, (uint64_t)(g_start_time_us / 1000));
     g_logged_first_fb_wait = false;
     g_logged_first_fb_captured = false;
     g_logged_first_frame_ready = false;
@@ -625,8 +630,12 @@ camera_status_t camera_read_capture(frame_t *frame,
         fb = NULL;
     }
 
+    // Sample the timer once per frame; the timestamp and the FPS window
+    // below share it.
+    int64_t now_us = esp_timer_get_time();
+
     // Set frame metadata
-    frame->timestamp_ms = (uint32_t)((esp_timer_get_time() - g_start_time_us) / 1000);
+    frame->timestamp_ms = (uint32_t)((now_us - g_start_time_us) / 1000);
     frame->sequence = g_sequence++;
     frame->valid = true;
 
@@ -636,16 +645,7 @@ camera_status_t camera_read_capture(frame_t *frame,
     }
 
     g_frames_captured++;
-    g_fps_frame_count++;
-
-    // Update FPS measurement
-    int64_t now_us = esp_timer_get_time();
-    int64_t elapsed_us = now_us - g_fps_start_time_us;
-    if (elapsed_us >= FPS_SAMPLE_INTERVAL_MS * 1000) {
-        g_current_fps = (float)g_fps_frame_count * 1000000.0f / (float)elapsed_us;
-        g_fps_frame_count = 0;
-        g_fps_start_time_us = now_us;
-    }
+    camera_fps_frame(&g_fps, (uint64_t)(now_us / 1000));
 
     // Invoke callback if set.
     // Copy function pointer and user data to local variables before invoking
@@ -669,7 +669,7 @@ bool camera_is_open(void) {
 }
 
 float camera_get_fps(void) {
-    return g_current_fps;
+    return g_fps.current_fps;
 }
 
 void camera_get_stats(camera_stats_t *stats) {
@@ -677,7 +677,7 @@ void camera_get_stats(camera_stats_t *stats) {
 
     stats->frames_captured = g_frames_captured;
     stats->frames_dropped = g_frames_dropped;
-    stats->current_fps = g_current_fps;
+    stats->current_fps = g_fps.current_fps;
     stats->reconnect_count = 0;
 
     if (g_is_open) {
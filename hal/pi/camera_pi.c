@@ -10,6 +10,7 @@
  */
 
 #include "camera.h"
+#include "camera_fps.h"
 #include "log.h"
 #include "platform.h"
 
@@ -26,16 +27,18 @@
 #include <pthread.h>
 #include <linux/videodev2.h>
 
-#define NUM_BUFFERS 4
-#define FPS_SAMPLE_INTERVAL_MS 1000
+#define NUM_BUFFERS 4        // Buffers requested from the driver
+#define MAX_BUFFERS 8        // Drivers may raise the count to their minimum
 
 // Internal camera state
 typedef struct {
     int fd;
-    uint8_t *buffers[NUM_BUFFERS];
-    size_t buffer_lengths[NUM_BUFFERS];
+    uint8_t *buffers[MAX_BUFFERS];
+    size_t buffer_lengths[MAX_BUFFERS];
+    unsigned int buffer_count;  // Buffers actually granted and mapped
     uint16_t capture_width;
     uint16_t capture_height;
+    uint32_t bytes_per_line;    // Driver row stride (may include padding)
 
     // Frame tracking
     uint32_t sequence;
@@ -43,9 +46,7 @@ typedef struct {
     uint32_t frames_dropped;
 
     // FPS measurement
-    uint32_t fps_frame_count;
-    uint64_t fps_start_time_ms;
-    float current_fps;
+    camera_fps_t fps;
 
     // Timing
     uint64_t open_time_ms;
@@ -79,7 +80,7 @@ static pthread_mutex_t g_callback_mutex = PTHREAD_MUTEX_INITIALIZER;
 static uint64_t get_time_ms(void) {
     struct timespec ts;
     clock_gettime(CLOCK_MONOTONIC, &ts);
-    return (uint64_t)(ts.tv_sec * 1000 + ts.tv_nsec / 1000000);
+    return (uint64_t)ts.tv_sec * 1000 + (uint64_t)(ts.tv_nsec / 1000000);
 }
 
 /**
@@ -119,6 +120,25 @@ static void yuyv_to_bgr(const uint8_t *src, uint8_t *dst, size_t width, size_t h
     }
 }
 
+/**
+ * Expand 8-bit luma into BGR24 by replicating Y into all three channels.
+ * Used for GREY captures and for grayscale mode on YUYV cameras, where
+ * the chroma maths of yuyv_to_bgr() would be discarded downstream anyway.
+ *
+ * @param src Source luma samples
+ * @param src_step Byte distance between luma samples (1 = GREY, 2 = YUYV)
+ * @param dst Destination BGR24 buffer
+ * @param pixels Number of pixels to convert
+ */
+static void luma_to_bgr(const uint8_t *src, size_t src_step, uint8_t *dst, size_t pixels) {
+    for (size_t i = 0; i < pixels; i++) {
+        uint8_t y = src[i * src_step];
+        dst[i * 3 + 0] = y;
+        dst[i * 3 + 1] = y;
+        dst[i * 3 + 2] = y;
+    }
+}
+
 camera_status_t camera_init(const apis_camera_config_t *config) {
     if (config == NULL) {
         LOG_ERROR("Camera config is NULL");
@@ -189,22 +209,66 @@ camera_status_t camera_open(void) {
     fmt.fmt.pix.pixelformat = V4L2_PIX_FMT_BGR24;
     fmt.fmt.pix.field = V4L2_FIELD_NONE;
 
-    if (ioctl(g_camera.fd, VIDIOC_S_FMT, &fmt) < 0) {
+    // Grayscale mode asks the sensor for luma only (1 byte/px instead of 3),
+    // which cuts USB/CSI and memory bandwidth for the motion pipeline.
+    bool have_format = false;
+    if (g_camera.config.grayscale) {
+        fmt.fmt.pix.pixelformat = V4L2_PIX_FMT_GREY;
+        if (ioctl(g_camera.fd, VIDIOC_S_FMT, &fmt) == 0 &&
+            fmt.fmt.pix.pixelformat == V4L2_PIX_FMT_GREY) {
+            LOG_INFO("Using GREY format (luma-only capture)");
+            have_format = true;
+        } else {
+            LOG_DEBUG("GREY not supported, trying BGR24");
+            fmt.fmt.pix.width = g_camera.config.width;
+            fmt.fmt.pix.height = g_camera.config.height;
+            fmt.fmt.pix.pixelformat = V4L2_PIX_FMT_BGR24;
+            fmt.fmt.pix.field = V4L2_FIELD_NONE;
+        }
+    }
+
+    // V4L2 drivers usually answer S_FMT with the closest format they support
+    // instead of failing, so check the negotiated fourcc. Only a genuine
+    // BGR24 stream can take the single-memcpy path in camera_read_capture().
+    if (!have_format &&
+        (ioctl(g_camera.fd, VIDIOC_S_FMT, &fmt) < 0 ||
+         fmt.fmt.pix.pixelformat != V4L2_PIX_FMT_BGR24)) {
         // Try YUYV fallback (more common)
         LOG_DEBUG("BGR24 not supported, trying YUYV");
+        fmt.fmt.pix.width = g_camera.config.width;
+        fmt.fmt.pix.height = g_camera.config.height;
         fmt.fmt.pix.pixelformat = V4L2_PIX_FMT_YUYV;
+        fmt.fmt.pix.field = V4L2_FIELD_NONE;
         if (ioctl(g_camera.fd, VIDIOC_S_FMT, &fmt) < 0) {
             LOG_ERROR("VIDIOC_S_FMT failed: %s", strerror(errno));
             close(g_camera.fd);
             g_camera.fd = -1;
             return CAMERA_ERROR_CONFIG_FAILED;
         }
+        if (fmt.fmt.pix.pixelformat != V4L2_PIX_FMT_YUYV) {
+            LOG_ERROR("Camera offers neither BGR24 nor YUYV (got %c%c%c%c)",
+                      (fmt.fmt.pix.pixelformat >> 0) & 0xFF,
+                      (fmt.fmt.pix.pixelformat >> 8) & 0xFF,
+                      (fmt.fmt.pix.pixelformat >> 16) & 0xFF,
+                      (fmt.fmt.pix.pixelformat >> 24) & 0xFF);
+            close(g_camera.fd);
+            g_camera.fd = -1;
+            return CAMERA_ERROR_CONFIG_FAILED;
+        }
         LOG_INFO("Using YUYV format (will convert to BGR)");
     }
 
     g_camera.pixel_format = fmt.fmt.pix.pixelformat;
     g_camera.capture_width = (uint16_t)fmt.fmt.pix.width;
     g_camera.capture_height = (uint16_t)fmt.fmt.pix.height;
+    g_camera.bytes_per_line = fmt.fmt.pix.bytesperline;
+    if (g_camera.bytes_per_line == 0) {
+        // Packed layout; some drivers leave bytesperline unset
+        uint32_t bytes_per_pixel =
+            g_camera.pixel_format == V4L2_PIX_FMT_BGR24 ? 3 :
+            g_camera.pixel_format == V4L2_PIX_FMT_YUYV ? 2 : 1;
+        g_camera.bytes_per_line = (uint32_t)g_camera.capture_width * bytes_per_pixel;
+    }
 
     size_t capture_pixels = (size_t)g_camera.capture_width * (size_t)g_camera.capture_height;
     size_t frame_pixels = (size_t)FRAME_WIDTH * (size_t)FRAME_HEIGHT;
@@ -254,10 +318,33 @@ camera_status_t camera_open(void) {
         return CAMERA_ERROR_NO_MEMORY;
     }
 
+    // The driver may grant more than requested. Map and queue every granted
+    // buffer: any left unqueued would still hold kernel (CMA) memory while
+    // contributing nothing, and too few queued buffers stall capture. The
+    // HAL tracks at most MAX_BUFFERS, so a larger grant is shrunk back to
+    // that with a second REQBUFS (allowed here: nothing is mapped yet).
+    if (req.count > MAX_BUFFERS) {
+        LOG_WARN("Driver granted %u buffers, re-requesting %d", req.count, MAX_BUFFERS);
+        req.count = MAX_BUFFERS;
+        if (ioctl(g_camera.fd, VIDIOC_REQBUFS, &req) < 0) {
+            LOG_ERROR("VIDIOC_REQBUFS failed: %s", strerror(errno));
+            close(g_camera.fd);
+            g_camera.fd = -1;
+            return CAMERA_ERROR_CONFIG_FAILED;
+        }
+        if (req.count < 2 || req.count > MAX_BUFFERS) {
+            LOG_ERROR("Driver granted %u buffers, need 2-%d", req.count, MAX_BUFFERS);
+            close(g_camera.fd);
+            g_camera.fd = -1;
+            return CAMERA_ERROR_NO_MEMORY;
+        }
+    }
+    g_camera.buffer_count = req.count;
+
     LOG_DEBUG("Allocated %d buffers", req.count);
 
     // Map buffers
-    for (unsigned int i = 0; i < req.count && i < NUM_BUFFERS; i++) {
+    for (unsigned int i = 0; i < g_camera.buffer_count; i++) {
         struct v4l2_buffer buf = {0};
         buf.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
         buf.memory = V4L2_MEMORY_MMAP;
@@ -282,7 +369,7 @@ camera_status_t camera_open(void) {
     }
 
     // Queue all buffers
-    for (unsigned int i = 0; i < req.count && i < NUM_BUFFERS; i++) {
+    for (unsigned int i = 0; i < g_camera.buffer_count; i++) {
         struct v4l2_buffer buf = {0};
         buf.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
         buf.memory = V4L2_MEMORY_MMAP;
@@ -308,10 +395,8 @@ camera_status_t camera_open(void) {
     g_camera.sequence = 0;
     g_camera.frames_captured = 0;
     g_camera.frames_dropped = 0;
-    g_camera.fps_frame_count = 0;
-    g_camera.fps_start_time_ms = get_time_ms();
-    g_camera.open_time_ms = g_camera.fps_start_time_ms;
-    g_camera.current_fps = 0.0f;
+    g_camera.open_time_ms = get_time_ms();
+    camera_fps_reset(&g_camera.fps, g_camera.open_time_ms);
 
     LOG_INFO("Camera opened successfully");
     return CAMERA_OK;
@@ -330,7 +415,16 @@ camera_status_t camera_read_capture(frame_t *frame,
         return CAMERA_ERROR_READ_FAILED;
     }
 
-    frame_init(frame);
+    // Skip frame_init() — its memset(frame->data, 0, FRAME_SIZE) zero-fills
+    // 921KB on every read, only for the pixel data to be overwritten by the
+    // copy/conversion below. The caller's frame buffer is reused as-is;
+    // just reset the metadata fields. A capture smaller than the frame
+    // buffer gets its tail zeroed after the size check instead.
+    frame->timestamp_ms = 0;
+    frame->sequence = 0;
+    frame->width = FRAME_WIDTH;
+    frame->height = FRAME_HEIGHT;
+    frame->valid = false;
     if (jpeg_frame != NULL) {
         jpeg_frame->size = 0;
         jpeg_frame->width = 0;
@@ -376,6 +470,26 @@ camera_status_t camera_read_capture(frame_t *frame,
         return CAMERA_ERROR_DISCONNECTED;
     }
 
+    // Latest frame wins (same policy as CAMERA_GRAB_LATEST on ESP32). The
+    // driver keeps capturing into the queued buffers while the pipeline
+    // runs, so after a slow iteration several frames can be waiting. Hand
+    // out the newest and recycle the stale ones so detection and targeting
+    // never work through a backlog. The fd is O_NONBLOCK, so DQBUF returns
+    // EAGAIN as soon as the queue is empty.
+    for (;;) {
+        struct v4l2_buffer newer = {0};
+        newer.type = V4L2_BUF_TYPE_VIDEO_CAPTURE;
+        newer.memory = V4L2_MEMORY_MMAP;
+
+        if (ioctl(g_camera.fd, VIDIOC_DQBUF, &newer) < 0) {
+            break;
+        }
+
+        (void)ioctl(g_camera.fd, VIDIOC_QBUF, &buf);
+        g_camera.frames_dropped++;
+        buf = newer;
+    }
+
     size_t capture_pixels = (size_t)g_camera.capture_width * (size_t)g_camera.capture_height;
     size_t frame_pixels = (size_t)FRAME_WIDTH * (size_t)FRAME_HEIGHT;
     if (capture_pixels > frame_pixels) {
@@ -386,10 +500,27 @@ camera_status_t camera_read_capture(frame_t *frame,
         return CAMERA_ERROR_READ_FAILED;
     }
 
-    // Convert/copy frame data
+    // Motion detection always scans FRAME_WIDTH x FRAME_HEIGHT pixels, so
+    // when the driver negotiated a smaller resolution the part of the
+    // buffer the capture does not cover must read as zeros, not stale or
+    // uninitialized heap.
+    if (capture_pixels < frame_pixels) {
+        memset(frame->data + capture_pixels * FRAME_CHANNELS, 0,
+               (frame_pixels - capture_pixels) * FRAME_CHANNELS);
+    }
+
+    // Convert/copy straight out of the mmap'd driver buffer. Rows are
+    // addressed by the negotiated stride so padded lines are handled; a
+    // packed frame takes a single pass over the whole buffer.
+    const uint8_t *src = g_camera.buffers[buf.index];
+    size_t width = g_camera.capture_width;
+    size_t height = g_camera.capture_height;
+    size_t stride = g_camera.bytes_per_line;
+
     if (g_camera.pixel_format == V4L2_PIX_FMT_BGR24) {
-        size_t expected_bytes = capture_pixels * FRAME_CHANNELS;
-        if (buf.bytesused < expected_bytes) {
+        size_t row_bytes = width * FRAME_CHANNELS;
+        size_t expected_bytes = stride * (height - 1) + row_bytes;
+        if (stride < row_bytes || buf.bytesused < expected_bytes) {
             LOG_ERROR("Short BGR frame: got %u bytes, need %zu",
                       buf.bytesused, expected_bytes);
             g_camera.frames_dropped++;
@@ -397,11 +528,18 @@ camera_status_t camera_read_capture(frame_t *frame,
             return CAMERA_ERROR_READ_FAILED;
         }
 
-        // Direct copy
-        memcpy(frame->data, g_camera.buffers[buf.index], expected_bytes);
+        if (stride == row_bytes) {
+            // Direct copy
+            memcpy(frame->data, src, capture_pixels * FRAME_CHANNELS);
+        } else {
+            for (size_t y = 0; y < height; y++) {
+                memcpy(frame->data + y * row_bytes, src + y * stride, row_bytes);
+            }
+        }
     } else if (g_camera.pixel_format == V4L2_PIX_FMT_YUYV) {
-        size_t required_input_bytes = capture_pixels * 2;
-        if (buf.bytesused < required_input_bytes) {
+        size_t row_bytes = width * 2;
+        size_t required_input_bytes = stride * (height - 1) + row_bytes;
+        if (stride < row_bytes || buf.bytesused < required_input_bytes) {
             LOG_ERROR("Short YUYV frame: got %u bytes, need %zu",
                       buf.bytesused, required_input_bytes);
             g_camera.frames_dropped++;
@@ -409,33 +547,59 @@ camera_status_t camera_read_capture(frame_t *frame,
             return CAMERA_ERROR_READ_FAILED;
         }
 
-        // Convert YUYV to BGR
-        yuyv_to_bgr(g_camera.buffers[buf.index], frame->data,
-                    g_camera.capture_width, g_camera.capture_height);
+        size_t rows = (stride == row_bytes) ? 1 : height;
+        size_t pixels_per_pass = (stride == row_bytes) ? capture_pixels : width;
+        for (size_t y = 0; y < rows; y++) {
+            const uint8_t *row_src = src + y * stride;
+            uint8_t *row_dst = frame->data + y * width * FRAME_CHANNELS;
+            if (g_camera.config.grayscale) {
+                // Take the Y samples only; chroma is dropped downstream anyway
+                luma_to_bgr(row_src, 2, row_dst, pixels_per_pass);
+            } else {
+                // Convert YUYV to BGR
+                yuyv_to_bgr(row_src, row_dst, pixels_per_pass, 1);
+            }
+        }
+    } else if (g_camera.pixel_format == V4L2_PIX_FMT_GREY) {
+        size_t required_input_bytes = stride * (height - 1) + width;
+        if (stride < width || buf.bytesused < required_input_bytes) {
+            LOG_ERROR("Short GREY frame: got %u bytes, need %zu",
+                      buf.bytesused, required_input_bytes);
+            g_camera.frames_dropped++;
+            (void)ioctl(g_camera.fd, VIDIOC_QBUF, &buf);
+            return CAMERA_ERROR_READ_FAILED;
+        }
+
+        if (stride == width) {
+            luma_to_bgr(src, 1, frame->data, capture_pixels);
+        } else {
+            for (size_t y = 0; y < height; y++) {
+                luma_to_bgr(src + y * stride, 1,
+                            frame->data + y * width * FRAME_CHANNELS, width);
+            }
+        }
     } else {
         // Unknown format - just copy raw data
         size_t copy_size = buf.bytesused < FRAME_SIZE ? buf.bytesused : FRAME_SIZE;
-        memcpy(frame->data, g_camera.buffers[buf.index], copy_size);
+        memcpy(frame->data, src, copy_size);
+        if (copy_size < FRAME_SIZE) {
+            memset(frame->data + copy_size, 0, FRAME_SIZE - copy_size);
+        }
     }
 
+    // Sample the clock once per frame; the timestamp and the FPS window
+    // below share it.
+    uint64_t now = get_time_ms();
+
     // Set frame metadata
-    frame->timestamp_ms = (uint32_t)(get_time_ms() - g_camera.open_time_ms);
+    frame->timestamp_ms = (uint32_t)(now - g_camera.open_time_ms);
     frame->sequence = g_camera.sequence++;
     frame->width = g_camera.capture_width;
     frame->height = g_camera.capture_height;
     frame->valid = true;
 
     g_camera.frames_captured++;
-    g_camera.fps_frame_count++;
-
-    // Update FPS measurement
-    uint64_t now = get_time_ms();
-    uint64_t elapsed = now - g_camera.fps_start_time_ms;
-    if (elapsed >= FPS_SAMPLE_INTERVAL_MS) {
-        g_camera.current_fps = (float)g_camera.fps_frame_count * 1000.0f / (float)elapsed;
-        g_camera.fps_frame_count = 0;
-        g_camera.fps_start_time_ms = now;
-    }
+    camera_fps_frame(&g_camera.fps, now);
 
     // Re-queue buffer
     if (ioctl(g_camera.fd, VIDIOC_QBUF, &buf) < 0) {
@@ -465,7 +629,7 @@ bool camera_is_open(void) {
 }
 
 float camera_get_fps(void) {
-    return g_camera.current_fps;
+    return g_camera.fps.current_fps;
 }
 
 void camera_get_stats(camera_stats_t *stats) {
@@ -473,7 +637,7 @@ void camera_get_stats(camera_stats_t *stats) {
 
     stats->frames_captured = g_camera.frames_captured;
     stats->frames_dropped = g_camera.frames_dropped;
-    stats->current_fps = g_camera.current_fps;
+    stats->current_fps = g_camera.fps.current_fps;
     stats->reconnect_count = g_camera.reconnect_count;
 
     if (g_camera.is_open) {
@@ -490,12 +654,13 @@ void camera_close(void) {
         ioctl(g_camera.fd, VIDIOC_STREAMOFF, &type);
 
         // Unmap buffers
-        for (int i = 0; i < NUM_BUFFERS; i++) {
+        for (int i = 0; i < MAX_BUFFERS; i++) {
             if (g_camera.buffers[i] && g_camera.buffers[i] != MAP_FAILED) {
                 munmap(g_camera.buffers[i], g_camera.buffer_lengths[i]);
                 g_camera.buffers[i] = NULL;
             }
         }
+        g_camera.buffer_count = 0;
 
         close(g_camera.fd);
         g_camera.fd = -1;
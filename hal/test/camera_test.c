@@ -2,20 +2,34 @@
  * Test Platform Camera HAL Stub
  *
  * Provides no-op camera functions for the test platform so that
- * camera-dependent test binaries can link. The test_camera test
- * will report "no valid frames" but won't crash.
+ * camera-dependent test binaries can link. Frames are stamped from a
+ * synthetic clock that advances exactly 1/fps per frame and fed to the
+ * FPS window the Pi and ESP32 HALs share (camera_fps.h), so that
+ * accounting can be exercised deterministically without hardware or
+ * real-time pacing.
  */
 
 #include "camera.h"
+#include "camera_fps.h"
 #include <string.h>
 
 static bool g_initialized = false;
 static bool g_open = false;
 static camera_frame_callback_t g_callback = NULL;
 static void *g_callback_data = NULL;
+static uint32_t g_sequence = 0;
+static uint8_t g_fps = 10;
+static camera_fps_t g_fps_window;
+
+/**
+ * Synthetic capture time of a frame: exactly 1/fps after the previous one.
+ */
+static uint32_t synthetic_time_ms(uint32_t sequence) {
+    return (uint32_t)((uint64_t)sequence * 1000 / g_fps);
+}
 
 camera_status_t camera_init(const apis_camera_config_t *config) {
-    (void)config;
+    g_fps = (config != NULL && config->fps > 0) ? config->fps : 10;
     g_initialized = true;
     return CAMERA_OK;
 }
@@ -23,6 +37,8 @@ camera_status_t camera_init(const apis_camera_config_t *config) {
 camera_status_t camera_open(void) {
     if (!g_initialized) return CAMERA_ERROR_NOT_FOUND;
     g_open = true;
+    g_sequence = 0;
+    camera_fps_reset(&g_fps_window, synthetic_time_ms(0));
     return CAMERA_OK;
 }
 
@@ -36,8 +52,10 @@ camera_status_t camera_read(frame_t *frame, uint32_t timeout_ms) {
     frame->width = FRAME_WIDTH;
     frame->height = FRAME_HEIGHT;
     frame->valid = true;
-    frame->timestamp_ms = 0;
-    frame->sequence = 0;
+    uint32_t now = synthetic_time_ms(g_sequence);
+    frame->timestamp_ms = now;
+    frame->sequence = g_sequence++;
+    camera_fps_frame(&g_fps_window, now);
 
     if (g_callback) {
         g_callback(frame, g_callback_data);
@@ -51,12 +69,14 @@ bool camera_is_open(void) {
 }
 
 float camera_get_fps(void) {
-    return 0.0f;
+    return g_fps_window.current_fps;
 }
 
 void camera_get_stats(camera_stats_t *stats) {
     if (stats) {
         memset(stats, 0, sizeof(*stats));
+        stats->frames_captured = g_sequence;
+        stats->current_fps = g_fps_window.current_fps;
     }
 }
 
@@ -27,6 +27,7 @@ typedef struct {
     uint16_t height;                     // Frame height (default: 480)
     uint8_t fps;                         // Target FPS (default: 10)
     float focus_distance;                // Pi Camera only (meters)
+    bool grayscale;                      // Pi only: luma-only capture (default: false)
 } apis_camera_config_t;
 
 /**
@@ -91,6 +91,31 @@ rolling_buffer_status_t rolling_buffer_add_capture(const frame_t *frame,
  */
 int rolling_buffer_get_all(buffered_frame_t *frames);
 
+/**
+ * Visitor callback for rolling_buffer_for_each().
+ *
+ * @param frame Buffered frame (read-only, only valid during the call)
+ * @param user_data User data passed to rolling_buffer_for_each()
+ */
+typedef void (*rolling_buffer_visitor_t)(const buffered_frame_t *frame, void *user_data);
+
+/**
+ * Visit all frames currently in the buffer without copying them.
+ *
+ * Frames are visited in chronological order (oldest first) directly from
+ * the buffer slots, avoiding the MAX_BUFFER_FRAMES x FRAME_SIZE allocation
+ * and copy of rolling_buffer_get_all().
+ *
+ * THREAD SAFETY: The buffer mutex is held for the whole traversal. The
+ * visitor must not call other rolling_buffer functions, and concurrent
+ * rolling_buffer_add() calls block until the traversal finishes.
+ *
+ * @param visitor Callback invoked once per buffered frame
+ * @param user_data User data passed to the visitor
+ * @return Number of frames visited (>=0), -1 on error
+ */
+int rolling_buffer_for_each(rolling_buffer_visitor_t visitor, void *user_data);
+
 /**
  * Allocate frame array with data buffers for use with rolling_buffer_get_all().
  *
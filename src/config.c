@@ -31,6 +31,7 @@ static config_t g_config = {
 #endif
         .fps = 10,
         .focus_distance = 1.5f,
+        .grayscale = false,
     },
     .storage = {
 #ifdef APIS_PLATFORM_ESP32
@@ -225,6 +226,9 @@ const config_t *config_load(const char *path) {
                             g_config.camera.fps = (uint8_t)atoi(value);
                         } else if (strcmp(current_key, "focus_distance") == 0) {
                             g_config.camera.focus_distance = (float)atof(value);
+                        } else if (strcmp(current_key, "grayscale") == 0) {
+                            g_config.camera.grayscale =
+                                (strcmp(value, "true") == 0 || strcmp(value, "1") == 0);
                         }
                     } else if (strcmp(current_section, "storage") == 0) {
                         if (strcmp(current_key, "data_dir") == 0) {
@@ -36,33 +36,52 @@ static const char *LEVEL_NAMES[] = {"DEBUG", "INFO", "WARN", "ERROR"};
 static const char *LEVEL_COLORS[] = {"\033[36m", "\033[32m", "\033[33m", "\033[31m"};
 static const char *COLOR_RESET = "\033[0m";
 
+#if defined(APIS_PLATFORM_PI) || defined(APIS_PLATFORM_TEST)
 /**
  * Get current timestamp string.
+ *
+ * Only the millisecond part changes between most log lines, so the
+ * localtime_r() + date formatting is redone once per second and cached.
+ * Caller must hold g_log_mutex (the cache is shared).
  */
 static void get_timestamp(char *buf, size_t len) {
-#if defined(APIS_PLATFORM_PI) || defined(APIS_PLATFORM_TEST)
+    static time_t s_cached_sec = (time_t)-1;
+    // Sized for the worst-case widths of the %d fields below, not just the
+    // 19 characters a real date needs, so the formatting cannot truncate.
+    static char s_cached_prefix[72] = "0000-00-00T00:00:00";
+    static size_t s_cached_len = 19;
+
     struct timeval tv;
     gettimeofday(&tv, NULL);
-    // S8-H3 fix: Use localtime_r() instead of localtime() for thread safety.
-    // localtime() uses a single static buffer shared across all threads,
-    // which can be corrupted by concurrent calls from the log mutex not
-    // covering all callers on all platforms.
-    struct tm tm_buf;
-    struct tm *tm = localtime_r(&tv.tv_sec, &tm_buf);
-
-    if (tm) {
-        snprintf(buf, len, "%04d-%02d-%02dT%02d:%02d:%02d.%03d",
-                 tm->tm_year + 1900, tm->tm_mon + 1, tm->tm_mday,
-                 tm->tm_hour, tm->tm_min, tm->tm_sec,
-                 (int)(tv.tv_usec / 1000));
-    } else {
-        snprintf(buf, len, "0000-00-00T00:00:00.000");
+
+    if (tv.tv_sec != s_cached_sec) {
+        // S8-H3 fix: Use localtime_r() instead of localtime() for thread safety.
+        // localtime() uses a single static buffer shared across all threads,
+        // which can be corrupted by concurrent calls from the log mutex not
+        // covering all callers on all platforms.
+        struct tm tm_buf;
+        struct tm *tm = localtime_r(&tv.tv_sec, &tm_buf);
+
+        if (tm) {
+            snprintf(s_cached_prefix, sizeof(s_cached_prefix),
+                     "%04d-%02d-%02dT%02d:%02d:%02d",
+                     tm->tm_year + 1900, tm->tm_mon + 1, tm->tm_mday,
+                     tm->tm_hour, tm->tm_min, tm->tm_sec);
+        } else {
+            snprintf(s_cached_prefix, sizeof(s_cached_prefix), "0000-00-00T00:00:00");
+        }
+        s_cached_len = strlen(s_cached_prefix);
+        s_cached_sec = tv.tv_sec;
     }
-#else
-    // ESP32: use tick count
-    snprintf(buf, len, "%lu", (unsigned long)(esp_timer_get_time() / 1000));
-#endif
+
+    if (len == 0) {
+        return;
+    }
+    size_t n = s_cached_len < len - 1 ? s_cached_len : len - 1;
+    memcpy(buf, s_cached_prefix, n);
+    snprintf(buf + n, len - n, ".%03u", (unsigned)(tv.tv_usec / 1000) % 1000u);
 }
+#endif
 
 /**
  * Extract filename from path.
@@ -193,9 +212,6 @@ void log_write(log_level_t level, const char *file, int line, const char *fmt, .
         log_init(NULL, LOG_LEVEL_INFO, false);
     }
 
-    char timestamp[32];
-    get_timestamp(timestamp, sizeof(timestamp));
-
     const char *filename = basename_from_path(file);
     const char *level_name = LEVEL_NAMES[level];
 
@@ -209,6 +225,10 @@ void log_write(log_level_t level, const char *file, int line, const char *fmt, .
 #if defined(APIS_PLATFORM_PI) || defined(APIS_PLATFORM_TEST)
     pthread_mutex_lock(&g_log_mutex);
 
+    // ESP-IDF stamps its own log lines, so the timestamp is only built here.
+    char timestamp[32];
+    get_timestamp(timestamp, sizeof(timestamp));
+
     FILE *out = g_log_file ? g_log_file : stdout;
 
     if (g_json_format) {
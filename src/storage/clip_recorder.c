@@ -24,6 +24,7 @@
 #include "freertos/FreeRTOS.h"
 #include "freertos/semphr.h"
 #include "img_converters.h"
+#include "psram_alloc.h"
 #endif
 
 #ifdef APIS_PLATFORM_PI
@@ -77,11 +78,17 @@ static AVStream *g_stream = NULL;
 static struct SwsContext *g_sws_ctx = NULL;
 static AVFrame *g_frame = NULL;
 static int g_frame_count = 0;
+
+#define H264_HW_ENCODER "h264_v4l2m2m"
+#define H264_BIT_RATE   2000000
+static bool g_hw_encoder_failed = false;
 #elif defined(APIS_PLATFORM_ESP32)
 #define AVI_MAX_FRAMES 96
 #define AVI_MJPEG_QUALITY 80
+#define AVI_IO_BUFFER_SIZE (32 * 1024)
 
 static FILE *g_avi_fp = NULL;
+static char *g_avi_io_buf = NULL;
 static uint32_t g_avi_frame_offsets[AVI_MAX_FRAMES];
 static uint32_t g_avi_frame_sizes[AVI_MAX_FRAMES];
 static uint32_t g_avi_frame_count = 0;
@@ -225,6 +232,50 @@ static int ensure_output_dir(void) {
     return 0;
 }
 
+/**
+ * Allocate and open an H.264 codec context for the current clip.
+ *
+ * @param codec Encoder to open (hardware or software)
+ * @return Opened codec context, or NULL on failure
+ */
+static AVCodecContext *open_h264_codec(const AVCodec *codec) {
+    AVCodecContext *ctx = avcodec_alloc_context3(codec);
+    if (!ctx) {
+        LOG_ERROR("Failed to allocate codec context");
+        return NULL;
+    }
+
+    ctx->codec_id = AV_CODEC_ID_H264;
+    ctx->codec_type = AVMEDIA_TYPE_VIDEO;
+    ctx->width = g_record_width;
+    ctx->height = g_record_height;
+    ctx->time_base = (AVRational){1, g_config.fps};
+    ctx->framerate = (AVRational){g_config.fps, 1};
+    ctx->pix_fmt = AV_PIX_FMT_YUV420P;
+    ctx->gop_size = 10;
+    ctx->max_b_frames = 0;
+
+    if (strcmp(codec->name, H264_HW_ENCODER) == 0) {
+        // The hardware encoder is rate-controlled and needs an explicit
+        // target; it also only emits SPS/PPS out of band when asked to.
+        ctx->bit_rate = H264_BIT_RATE;
+        if (g_format_ctx->oformat->flags & AVFMT_GLOBALHEADER) {
+            ctx->flags |= AV_CODEC_FLAG_GLOBAL_HEADER;
+        }
+    } else if (strcmp(codec->name, "libx264") == 0) {
+        // Set preset for speed on Pi
+        av_opt_set(ctx->priv_data, "preset", "ultrafast", 0);
+        av_opt_set(ctx->priv_data, "tune", "zerolatency", 0);
+    }
+
+    if (avcodec_open2(ctx, codec, NULL) < 0) {
+        avcodec_free_context(&ctx);
+        return NULL;
+    }
+
+    return ctx;
+}
+
 /**
  * Initialize FFmpeg encoder for H.264.
  */
@@ -238,15 +289,6 @@ static int init_encoder(const char *filepath) {
         return -1;
     }
 
-    // Find H.264 encoder
-    const AVCodec *codec = avcodec_find_encoder(AV_CODEC_ID_H264);
-    if (!codec) {
-        LOG_ERROR("H.264 codec not found");
-        avformat_free_context(g_format_ctx);
-        g_format_ctx = NULL;
-        return -1;
-    }
-
     // Create stream
     g_stream = avformat_new_stream(g_format_ctx, NULL);
     if (!g_stream) {
@@ -256,40 +298,43 @@ static int init_encoder(const char *filepath) {
         return -1;
     }
 
-    // Allocate codec context
-    g_codec_ctx = avcodec_alloc_context3(codec);
-    if (!g_codec_ctx) {
-        LOG_ERROR("Failed to allocate codec context");
-        avformat_free_context(g_format_ctx);
-        g_format_ctx = NULL;
-        return -1;
+    // Prefer the VideoCore hardware encoder (V4L2 M2M): libx264 at
+    // ultrafast still costs most of a Pi Zero 2W core per stream.
+    // Stock FFmpeg ships the encoder even on boards without the device
+    // (e.g. Pi 5), so a failed open is remembered rather than re-probed
+    // on every clip start.
+    const AVCodec *codec = NULL;
+    if (!g_hw_encoder_failed) {
+        codec = avcodec_find_encoder_by_name(H264_HW_ENCODER);
+        if (codec != NULL) {
+            g_codec_ctx = open_h264_codec(codec);
+        }
+        if (g_codec_ctx == NULL) {
+            g_hw_encoder_failed = true;
+            LOG_INFO("Hardware encoder %s unavailable, using software H.264",
+                     H264_HW_ENCODER);
+        }
     }
 
-    g_codec_ctx->codec_id = AV_CODEC_ID_H264;
-    g_codec_ctx->codec_type = AVMEDIA_TYPE_VIDEO;
-    g_codec_ctx->width = g_record_width;
-    g_codec_ctx->height = g_record_height;
-    g_codec_ctx->time_base = (AVRational){1, g_config.fps};
-    g_codec_ctx->framerate = (AVRational){g_config.fps, 1};
-    g_codec_ctx->pix_fmt = AV_PIX_FMT_YUV420P;
-    g_codec_ctx->gop_size = 10;
-    g_codec_ctx->max_b_frames = 0;
-
-    // Set preset for speed on Pi
-    av_opt_set(g_codec_ctx->priv_data, "preset", "ultrafast", 0);
-    av_opt_set(g_codec_ctx->priv_data, "tune", "zerolatency", 0);
-
-    // Open codec
-    ret = avcodec_open2(g_codec_ctx, codec, NULL);
-    if (ret < 0) {
-        LOG_ERROR("Could not open H.264 codec");
-        avcodec_free_context(&g_codec_ctx);
-        avformat_free_context(g_format_ctx);
-        g_format_ctx = NULL;
-        g_codec_ctx = NULL;
-        return -1;
+    if (g_codec_ctx == NULL) {
+        codec = avcodec_find_encoder(AV_CODEC_ID_H264);
+        if (!codec) {
+            LOG_ERROR("H.264 codec not found");
+            avformat_free_context(g_format_ctx);
+            g_format_ctx = NULL;
+            return -1;
+        }
+        g_codec_ctx = open_h264_codec(codec);
+        if (g_codec_ctx == NULL) {
+            LOG_ERROR("Could not open H.264 codec");
+            avformat_free_context(g_format_ctx);
+            g_format_ctx = NULL;
+            return -1;
+        }
     }
 
+    LOG_DEBUG("Encoding clip with %s", codec->name);
+
     // Copy codec parameters to stream
     avcodec_parameters_from_context(g_stream->codecpar, g_codec_ctx);
     g_stream->time_base = g_codec_ctx->time_base;
@@ -540,27 +585,36 @@ static int init_avi_writer(const char *filepath, uint16_t width, uint16_t height
         return -1;
     }
 
+    // newlib's default 128-byte stdio buffer turns every JPEG frame into
+    // hundreds of small SD writes. Allocated once and reused across clips.
+    if (g_avi_io_buf == NULL) {
+        g_avi_io_buf = psram_malloc(AVI_IO_BUFFER_SIZE);
+    }
+    if (g_avi_io_buf != NULL) {
+        setvbuf(g_avi_fp, g_avi_io_buf, _IOFBF, AVI_IO_BUFFER_SIZE);
+    }
+
     memset(g_avi_frame_offsets, 0, sizeof(g_avi_frame_offsets));
     memset(g_avi_frame_sizes, 0, sizeof(g_avi_frame_sizes));
     g_avi_frame_count = 0;
     g_last_written_frame_ts_ms = 0;
 
     if (!write_fourcc(g_avi_fp, "RIFF")) {
-        return -1;
+        goto fail;
     }
     g_avi_riff_size_offset = ftell(g_avi_fp);
     if (!write_u32_le(g_avi_fp, 0) ||
         !write_fourcc(g_avi_fp, "AVI ")) {
-        return -1;
+        goto fail;
     }
 
     if (!write_fourcc(g_avi_fp, "LIST")) {
-        return -1;
+        goto fail;
     }
     long hdrl_size_offset = ftell(g_avi_fp);
     if (!write_u32_le(g_avi_fp, 0) ||
         !write_fourcc(g_avi_fp, "hdrl")) {
-        return -1;
+        goto fail;
     }
 
     if (!write_fourcc(g_avi_fp, "avih") ||
@@ -569,7 +623,7 @@ static int init_avi_writer(const char *filepath, uint16_t width, uint16_t height
         !write_u32_le(g_avi_fp, (uint32_t)width * height * g_config.fps) ||
         !write_u32_le(g_avi_fp, 0) ||
         !write_u32_le(g_avi_fp, 0x10)) {
-        return -1;
+        goto fail;
     }
     g_avi_total_frames_offset = ftell(g_avi_fp);
     if (!write_u32_le(g_avi_fp, 0) ||
@@ -582,16 +636,16 @@ static int init_avi_writer(const char *filepath, uint16_t width, uint16_t height
         !write_u32_le(g_avi_fp, 0) ||
         !write_u32_le(g_avi_fp, 0) ||
         !write_u32_le(g_avi_fp, 0)) {
-        return -1;
+        goto fail;
     }
 
     if (!write_fourcc(g_avi_fp, "LIST")) {
-        return -1;
+        goto fail;
     }
     strl_size_offset = ftell(g_avi_fp);
     if (!write_u32_le(g_avi_fp, 0) ||
         !write_fourcc(g_avi_fp, "strl")) {
-        return -1;
+        goto fail;
     }
 
     if (!write_fourcc(g_avi_fp, "strh") ||
@@ -605,7 +659,7 @@ static int init_avi_writer(const char *filepath, uint16_t width, uint16_t height
         !write_u32_le(g_avi_fp, 1) ||
         !write_u32_le(g_avi_fp, g_config.fps) ||
         !write_u32_le(g_avi_fp, 0)) {
-        return -1;
+        goto fail;
     }
     g_avi_stream_length_offset = ftell(g_avi_fp);
     if (!write_u32_le(g_avi_fp, 0) ||
@@ -616,7 +670,7 @@ static int init_avi_writer(const char *filepath, uint16_t width, uint16_t height
         !write_u16_le(g_avi_fp, 0) ||
         !write_u16_le(g_avi_fp, width) ||
         !write_u16_le(g_avi_fp, height)) {
-        return -1;
+        goto fail;
     }
 
     if (!write_fourcc(g_avi_fp, "strf") ||
@@ -632,7 +686,7 @@ static int init_avi_writer(const char *filepath, uint16_t width, uint16_t height
         !write_u32_le(g_avi_fp, 0) ||
         !write_u32_le(g_avi_fp, 0) ||
         !write_u32_le(g_avi_fp, 0)) {
-        return -1;
+        goto fail;
     }
 
     hdrl_end = ftell(g_avi_fp);
@@ -640,20 +694,28 @@ static int init_avi_writer(const char *filepath, uint16_t width, uint16_t height
                       (uint32_t)(hdrl_end - (strl_size_offset + 4))) ||
         !patch_u32_le(g_avi_fp, hdrl_size_offset,
                       (uint32_t)(hdrl_end - (hdrl_size_offset + 4)))) {
-        return -1;
+        goto fail;
     }
 
     if (!write_fourcc(g_avi_fp, "LIST")) {
-        return -1;
+        goto fail;
     }
     g_avi_movi_size_offset = ftell(g_avi_fp);
     g_avi_movi_fourcc_offset = g_avi_movi_size_offset + 4;
     if (!write_u32_le(g_avi_fp, 0) ||
         !write_fourcc(g_avi_fp, "movi")) {
-        return -1;
+        goto fail;
     }
 
     return 0;
+
+fail:
+    // Never leave a half-written FILE attached to the shared g_avi_io_buf:
+    // the next clip's stream is given the same buffer.
+    LOG_ERROR("Failed to write AVI header: %s", filepath);
+    fclose(g_avi_fp);
+    g_avi_fp = NULL;
+    return -1;
 }
 
 static int write_avi_frame(const uint8_t *jpeg_data, size_t jpeg_size) {
@@ -854,6 +916,70 @@ bool clip_recorder_is_initialized(void) {
     return init;
 }
 
+/**
+ * Pre-roll dimension inference state for infer_pre_roll_dims().
+ */
+typedef struct {
+    uint16_t width;
+    uint16_t height;
+    bool found_jpeg;
+} pre_roll_dims_t;
+
+/**
+ * Rolling buffer visitor: infer clip dimensions from the pre-roll.
+ * The first JPEG-backed frame wins; otherwise the last raw frame wins.
+ */
+static void infer_pre_roll_dims(const buffered_frame_t *frame, void *user_data) {
+    pre_roll_dims_t *dims = (pre_roll_dims_t *)user_data;
+
+    if (dims->found_jpeg || !frame->valid) {
+        return;
+    }
+    if (frame->jpeg_size > 0 && frame->jpeg_width > 0 && frame->jpeg_height > 0) {
+        dims->width = frame->jpeg_width;
+        dims->height = frame->jpeg_height;
+        dims->found_jpeg = true;
+        return;
+    }
+    if (frame->width > 0 && frame->height > 0) {
+        dims->width = frame->width;
+        dims->height = frame->height;
+    }
+}
+
+#ifdef APIS_PLATFORM_PI
+/**
+ * Rolling buffer visitor: encode one pre-roll frame in place.
+ */
+static void encode_pre_roll_frame(const buffered_frame_t *frame, void *user_data) {
+    (void)user_data;
+    if (frame->valid && frame->data) {
+        encode_frame(frame->data);
+    }
+}
+#elif defined(APIS_PLATFORM_ESP32)
+/**
+ * Rolling buffer visitor: write one pre-roll frame in place.
+ */
+static void write_pre_roll_frame(const buffered_frame_t *frame, void *user_data) {
+    int *index = (int *)user_data;
+
+    if (frame->valid && frame->data != NULL) {
+        if (write_capture_frame_esp32(frame->data,
+                                      frame->width,
+                                      frame->height,
+                                      frame->timestamp_ms,
+                                      frame->jpeg_data,
+                                      frame->jpeg_size,
+                                      frame->jpeg_width,
+                                      frame->jpeg_height) < 0) {
+            LOG_WARN("Failed to encode pre-roll frame %d", *index);
+        }
+    }
+    (*index)++;
+}
+#endif
+
 /**
  * Start recording a new clip, or extend the current one.
  *
@@ -881,7 +1007,6 @@ const char *clip_recorder_start_owned(int64_t event_id,
                                       uint32_t duration_ms,
                                       clip_recorder_owner_t owner) {
     uint32_t target_duration_ms;
-    buffered_frame_t *pre_roll = NULL;
     int pre_roll_count = 0;
     uint16_t inferred_width = FRAME_WIDTH;
     uint16_t inferred_height = FRAME_HEIGHT;
@@ -926,24 +1051,21 @@ const char *clip_recorder_start_owned(int64_t event_id,
     g_last_result_available = false;
     g_owner = owner;
 
-    pre_roll = rolling_buffer_alloc_frames(MAX_BUFFER_FRAMES);
-    if (pre_roll != NULL) {
-        pre_roll_count = rolling_buffer_get_all(pre_roll);
-        for (int i = 0; i < pre_roll_count; i++) {
-            if (!pre_roll[i].valid) {
-                continue;
-            }
-            if (pre_roll[i].jpeg_size > 0 && pre_roll[i].jpeg_width > 0 && pre_roll[i].jpeg_height > 0) {
-                inferred_width = pre_roll[i].jpeg_width;
-                inferred_height = pre_roll[i].jpeg_height;
-                break;
-            }
-            if (pre_roll[i].width > 0 && pre_roll[i].height > 0) {
-                inferred_width = pre_roll[i].width;
-                inferred_height = pre_roll[i].height;
-            }
-        }
+    // Visit the pre-roll in place rather than copying it out: a full copy
+    // costs MAX_BUFFER_FRAMES * FRAME_SIZE of scratch memory per clip start.
+    // Capture and clip start share the main loop, so holding the buffer
+    // lock while encoding does not stall frame ingestion.
+    pre_roll_dims_t dims = {
+        .width = inferred_width,
+        .height = inferred_height,
+        .found_jpeg = false,
+    };
+    pre_roll_count = rolling_buffer_for_each(infer_pre_roll_dims, &dims);
+    if (pre_roll_count < 0) {
+        pre_roll_count = 0;
     }
+    inferred_width = dims.width;
+    inferred_height = dims.height;
     g_record_width = inferred_width;
     g_record_height = inferred_height;
 
@@ -951,50 +1073,22 @@ const char *clip_recorder_start_owned(int64_t event_id,
     // Initialize encoder
     if (init_encoder(g_current_clip) < 0) {
         g_state = RECORD_STATE_ERROR;
-        rolling_buffer_free_frames(pre_roll, MAX_BUFFER_FRAMES);
         CLIP_UNLOCK();
         return NULL;
     }
 
-    if (pre_roll != NULL) {
-        for (int i = 0; i < pre_roll_count; i++) {
-            if (pre_roll[i].valid && pre_roll[i].data) {
-                encode_frame(pre_roll[i].data);
-            }
-        }
-
-        rolling_buffer_free_frames(pre_roll, MAX_BUFFER_FRAMES);
-    } else {
-        LOG_WARN("Could not allocate pre-roll buffer, starting clip without pre-roll");
-    }
+    rolling_buffer_for_each(encode_pre_roll_frame, NULL);
 
     LOG_INFO("Started clip: %s with %d pre-roll frames", g_current_clip, pre_roll_count);
 #elif defined(APIS_PLATFORM_ESP32)
     if (init_avi_writer(g_current_clip, g_record_width, g_record_height) < 0) {
         g_state = RECORD_STATE_ERROR;
-        rolling_buffer_free_frames(pre_roll, MAX_BUFFER_FRAMES);
         CLIP_UNLOCK();
         return NULL;
     }
 
-    if (pre_roll != NULL) {
-        for (int i = 0; i < pre_roll_count; i++) {
-            if (pre_roll[i].valid && pre_roll[i].data != NULL) {
-                if (write_capture_frame_esp32(pre_roll[i].data,
-                                              pre_roll[i].width,
-                                              pre_roll[i].height,
-                                              pre_roll[i].timestamp_ms,
-                                              pre_roll[i].jpeg_data,
-                                              pre_roll[i].jpeg_size,
-                                              pre_roll[i].jpeg_width,
-                                              pre_roll[i].jpeg_height) < 0) {
-                    LOG_WARN("Failed to encode pre-roll frame %d", i);
-                }
-            }
-        }
-
-        rolling_buffer_free_frames(pre_roll, MAX_BUFFER_FRAMES);
-    }
+    int pre_roll_index = 0;
+    rolling_buffer_for_each(write_pre_roll_frame, &pre_roll_index);
 
     LOG_INFO("Started clip: %s with %d pre-roll frames", g_current_clip, pre_roll_count);
 #else
@@ -240,6 +240,31 @@ int rolling_buffer_get_all(buffered_frame_t *frames) {
     return count;
 }
 
+int rolling_buffer_for_each(rolling_buffer_visitor_t visitor, void *user_data) {
+    if (visitor == NULL) {
+        return -1;
+    }
+
+    pthread_mutex_lock(&g_mutex);
+
+    if (!g_initialized) {
+        LOG_WARN("rolling_buffer_for_each called before initialization");
+        pthread_mutex_unlock(&g_mutex);
+        return -1;
+    }
+
+    int count = g_count;
+    int start = (g_head - g_count + g_max_frames) % g_max_frames;
+
+    for (int i = 0; i < count; i++) {
+        visitor(&g_buffer[(start + i) % g_max_frames], user_data);
+    }
+
+    pthread_mutex_unlock(&g_mutex);
+
+    return count;
+}
+
 int rolling_buffer_count(void) {
     pthread_mutex_lock(&g_mutex);
     int count = g_initialized ? g_count : 0;
@@ -52,6 +52,7 @@ static storage_manager_clip_deleted_cb g_on_clip_deleted_cb = NULL;
 #define MAX_UPLOADED_CLIPS 100
 static char g_uploaded_clips[MAX_UPLOADED_CLIPS][256];
 static int g_uploaded_count = 0;
+static int g_uploaded_next = 0;     // Slot overwritten next once the list is full
 
 storage_manager_config_t storage_manager_config_defaults(void) {
     storage_manager_config_t config;
@@ -542,11 +543,12 @@ storage_manager_status_t storage_manager_mark_uploaded(const char *clip_path) {
         g_uploaded_count++;
         LOG_DEBUG("Clip marked as uploaded: %s", clip_path);
     } else {
-        // List full, remove oldest entry (circular behavior)
-        memmove(&g_uploaded_clips[0], &g_uploaded_clips[1],
-                (MAX_UPLOADED_CLIPS - 1) * sizeof(g_uploaded_clips[0]));
-        strncpy(g_uploaded_clips[MAX_UPLOADED_CLIPS - 1], clip_path, sizeof(g_uploaded_clips[0]) - 1);
-        g_uploaded_clips[MAX_UPLOADED_CLIPS - 1][sizeof(g_uploaded_clips[0]) - 1] = '\0';
+        // List full, overwrite oldest entry in place (ring buffer). Lookups
+        // scan every slot, so order does not matter and no 25KB memmove
+        // is needed per insert.
+        strncpy(g_uploaded_clips[g_uploaded_next], clip_path, sizeof(g_uploaded_clips[0]) - 1);
+        g_uploaded_clips[g_uploaded_next][sizeof(g_uploaded_clips[0]) - 1] = '\0';
+        g_uploaded_next = (g_uploaded_next + 1) % MAX_UPLOADED_CLIPS;
         LOG_DEBUG("Clip marked as uploaded (list rotated): %s", clip_path);
     }
 
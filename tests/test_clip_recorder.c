@@ -131,6 +131,24 @@ static void test_rolling_buffer_init(void) {
     TEST_PASS("Rolling Buffer Init/Cleanup");
 }
 
+/**
+ * Visitor that records the first/last sequence seen by rolling_buffer_for_each.
+ */
+typedef struct {
+    uint32_t first;
+    uint32_t last;
+    int visited;
+} sequence_span_t;
+
+static void record_sequence_span(const buffered_frame_t *frame, void *user_data) {
+    sequence_span_t *span = (sequence_span_t *)user_data;
+    if (span->visited == 0) {
+        span->first = frame->sequence;
+    }
+    span->last = frame->sequence;
+    span->visited++;
+}
+
 /**
  * Test rolling buffer add and retrieval.
  */
@@ -176,6 +194,14 @@ static void test_rolling_buffer_operations(void) {
 
     rolling_buffer_free_frames(frames, MAX_BUFFER_FRAMES);
 
+    // Zero-copy visit must see the same oldest-first order
+    sequence_span_t span = { .first = UINT32_MAX, .last = 0, .visited = 0 };
+    int visited = rolling_buffer_for_each(record_sequence_span, &span);
+    TEST_ASSERT(visited == MAX_BUFFER_FRAMES, "for_each should visit all frames");
+    TEST_ASSERT(span.visited == MAX_BUFFER_FRAMES, "Visitor should be called per frame");
+    TEST_ASSERT(span.first == (uint32_t)expected_oldest, "for_each should start at oldest");
+    TEST_ASSERT(span.last == 29, "for_each should end at newest");
+
     // Test clear
     rolling_buffer_clear();
     TEST_ASSERT(rolling_buffer_count() == 0, "Buffer should be empty after clear");
@@ -385,6 +411,9 @@ static void test_error_handling(void) {
     int count = rolling_buffer_get_all(NULL);
     TEST_ASSERT(count == -1, "get_all with NULL should return -1");
 
+    count = rolling_buffer_for_each(NULL, NULL);
+    TEST_ASSERT(count == -1, "for_each with NULL visitor should return -1");
+
     // Clip recorder ops without init
     const char *path = clip_recorder_start(1);
     TEST_ASSERT(path == NULL, "Start before init should return NULL");